@@ -0,0 +1,140 @@
+# answer_store.py
+import os, re, time, hashlib, logging, threading
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from langchain_qa import RAGApp, get_app
+from traffic_capture import record_stage
+
+logger = logging.getLogger(__name__)
+
+
+class AnswerStore:
+    """
+    자주 묻는 질문의 사전 계산 답변을 Mongo 컬렉션에 저장하고 조회.
+    각 항목은 근거 문서의 (source, page_number)별 내용 해시를 함께 저장해
+    원문이 바뀌면 stale로 판정되어 재생성 대상이 된다.
+    """
+
+    def __init__(self, rag_app: RAGApp, coll_name: Optional[str] = None, refresh_sec: Optional[float] = None,
+                 background: bool = True):
+        self.enabled = os.getenv("ANSWER_STORE_ENABLED", "true").lower() == "true"
+        # 업스트림 재생 모드(QNA_PLAYBACK_PATH)에서는 Mongo 대신 캡처된 조회 결과를 재생
+        self.playback = rag_app.playback
+        self.col  = rag_app.mongo[rag_app.DB_NAME][coll_name or os.getenv("MONGO_ANSWER_COLL", "precomputed_answers")]
+        self.docs = rag_app.col
+        self.refresh_sec = refresh_sec if refresh_sec is not None else \
+            float(os.getenv("ANSWER_STORE_REFRESH_SEC", "300"))
+
+        # /qna 조회는 메모리 스냅샷만 읽음 — 컬렉션 전체 find()는 이벤트 루프를 막지 않도록 백그라운드에서
+        self._entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        if self.enabled and self.playback is None and background:
+            threading.Thread(target=self._reload_loop, name="answer-store-reload", daemon=True).start()
+
+    # ---------- 키/지문 ----------
+    @staticmethod
+    def normalize_question(question: str) -> str:
+        q = re.sub(r"\s+", " ", (question or "").strip()).lower()
+        return q.rstrip("?.!？。 ")
+
+    @staticmethod
+    def source_keys(docs: List[Dict]) -> List[Tuple[str, Optional[int]]]:
+        seen, keys = set(), []
+        for d in docs:
+            key = (d.get("source"), d.get("page_number"))
+            if key in seen: continue
+            seen.add(key); keys.append(key)
+        return keys
+
+    def fingerprint(self, source: str, page_number: Optional[int]) -> str:
+        """(source, page_number)에 속한 청크 내용 전체의 해시"""
+        h = hashlib.sha1()
+        for d in self.docs.find({"source": source, "page_number": page_number}, {"content": 1}).sort("_id", 1):
+            h.update((d.get("content") or "").encode("utf-8"))
+            h.update(b"\x00")
+        return h.hexdigest()
+
+    # ---------- 조회 (요청마다) ----------
+    def reload(self) -> None:
+        entries = {}
+        for e in self.col.find({"stale": {"$ne": True}}, {"response": 1}):
+            entries[e["_id"]] = e["response"]
+        with self._lock:
+            self._entries = entries
+        logger.info(f"사전 계산 답변 {len(entries)}건 로드")
+
+    def _reload_loop(self) -> None:
+        while True:
+            try:
+                self.reload()
+            except Exception as e:
+                # 저장소 장애가 /qna를 막지 않도록 다음 주기까지 기존 스냅샷 사용
+                logger.warning(f"사전 계산 답변 로드 실패: {e}")
+            time.sleep(self.refresh_sec)
+
+    def lookup(self, question: str) -> Optional[Dict]:
+        if self.playback is not None:
+            return self.playback.get(question, "precomputed")
+        result = self._lookup(question) if self.enabled else None
+        # 미스(None)도 기록해야 재생 시 같은 질문이 같은 경로를 탄다
+        record_stage("precomputed", result)
+        return result
+
+    def _lookup(self, question: str) -> Optional[Dict]:
+        response = self._entries.get(self.normalize_question(question))
+        if response is None:
+            return None
+        return {**response, "messages": [{"HumanMessage": question}] + response["messages"][1:]}
+
+    # ---------- 생성/무효화 (오프라인 작업) ----------
+    def put(self, question: str, response: Dict, docs: List[Dict]) -> None:
+        sources = [{"source": s, "page_number": p, "fingerprint": self.fingerprint(s, p)}
+                   for s, p in self.source_keys(docs)]
+        self.col.replace_one(
+            {"_id": self.normalize_question(question)},
+            {"_id": self.normalize_question(question), "question": question, "response": response,
+             "sources": sources, "stale": False, "built_at": datetime.now(timezone.utc)},
+            upsert=True,
+        )
+
+    def delete(self, question: str) -> None:
+        self.col.delete_one({"_id": self.normalize_question(question)})
+
+    def invalidate_sources(self, changed: Iterable[Tuple[str, Optional[int]]]) -> int:
+        """
+        변경된 원문 (source, page_number|None=전체 페이지)을 근거로 한 항목을 stale 처리.
+        source는 저장된 전체 경로 또는 파일명(basename) 어느 쪽이든 경로 끝부분으로 매칭한다.
+        """
+        count = 0
+        for source, page in changed:
+            name = re.escape(os.path.basename(source))
+            match: Dict = {"source": {"$regex": f"(^|[/\\\\]){name}$"}}
+            if page is not None: match["page_number"] = page
+            res = self.col.update_many({"sources": {"$elemMatch": match}}, {"$set": {"stale": True}})
+            if res.matched_count == 0:
+                logger.warning(f"무효화 대상 없음: source={source!r}, page_number={page}")
+            count += res.matched_count
+        return count
+
+    def stale_questions(self) -> List[str]:
+        """stale 표시됐거나 근거 원문의 지문이 달라진 항목의 질문 목록"""
+        entries = list(self.col.find({}, {"question": 1, "sources": 1, "stale": 1}))
+        current: Dict[Tuple[str, Optional[int]], str] = {}
+        stale = []
+        for e in entries:
+            if e.get("stale"):
+                stale.append(e["question"]); continue
+            for s in e.get("sources", []):
+                key = (s["source"], s["page_number"])
+                if key not in current:
+                    current[key] = self.fingerprint(*key)
+                if current[key] != s["fingerprint"]:
+                    stale.append(e["question"]); break
+        return stale
+
+
+@lru_cache(maxsize=1)
+def get_answer_store() -> AnswerStore:
+    return AnswerStore(get_app())
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+hybrid_search의 검색 품질 대비 지연시간 평가 스크립트
+
+골든셋(JSONL, 한 줄에 하나):
+    {"question": "가족과 형제·자매 한정운전 특별약관 알려줘",
+     "expected": [{"source": "자동차보험_특별약관.pdf", "page_number": 12}]}
+
+사용 예:
+    # 라이브 Atlas에서 파라미터 그리드 평가
+    python eval_retrieval.py golden.jsonl --k 3,5,8 --num-candidates 200,400,800 --rrf-k 30,60 --recall-target 0.9
+
+    # 컬렉션 스냅샷을 내려받아 로컬에서 평가 (질의 임베딩은 캐시 파일에 저장돼 이후 오프라인 실행)
+    python eval_retrieval.py golden.jsonl --export-snapshot snapshot/documents.jsonl.gz
+    python eval_retrieval.py golden.jsonl --snapshot snapshot/documents.jsonl.gz --k 3,5,8 --rrf-k 30,60
+
+질의 임베딩은 질문마다 한 번만 계산해 캐시하고, 구성별 지연시간은 두 검색과
+RRF 융합만 측정한다 (임베딩 지연은 별도로 보고). 평가 중에는 섀도 벡터 검색을 끈다.
+로컬 스냅샷은 정확한(전수) 벡터 검색과 BM25 근사 텍스트 검색을 사용하므로
+num_candidates의 효과와 지연시간은 라이브 Atlas에서만 의미가 있다.
+스냅샷 모드는 RAGApp(Mongo/LLM 클라이언트, 라우터)을 만들지 않으므로 캐시에 없는
+질문의 임베딩을 계산할 때만 Azure OpenAI 환경 변수가 필요하다.
+"""
+
+import argparse
+import gzip
+import itertools
+import json
+import math
+import os
+import re
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+from langchain_qa import RAGApp, get_app
+from latency_stats import percentile
+from traffic_capture import iter_records
+
+try:
+    import numpy as np
+except ImportError:  # numpy가 없으면 순수 파이썬 내적으로 계산
+    np = None
+
+_TOKEN_RE = re.compile(r"[가-힣A-Za-z0-9]+")
+
+
+def _terms(text: str) -> List[str]:
+    # 한국어 형태소 분석기 대신 문자 bigram (Atlas korean analyzer 근사)
+    terms = []
+    for tok in _TOKEN_RE.findall((text or "").lower()):
+        terms.extend([tok] if len(tok) == 1 else [tok[i:i+2] for i in range(len(tok) - 1)])
+    return terms
+
+
+class QueryEmbeddingCache:
+    """
+    embed_query를 질문당 한 번만 호출하도록 감싸는 캐시 (RAGApp.emb 자리에 끼움).
+    실제 API 호출 지연은 latencies_ms에 따로 모은다.
+    캐시 파일은 model_key(배포 이름:차원)별로 나눠 저장해, 차원을 바꿔 평가해도
+    다른 차원의 벡터를 재사용하지 않는다.
+    """
+
+    def __init__(self, factory, path: Optional[str] = None, model_key: str = "default"):
+        self._factory = factory  # 캐시 미스 때만 임베딩 클라이언트를 만듦 (오프라인 실행 허용)
+        self._base = None
+        self.path = path
+        self._all: Dict[str, Dict[str, List[float]]] = {}
+        self.latencies_ms: List[float] = []
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self._all = json.load(f)
+        self.cache = self._all.setdefault(model_key, {})
+
+    def embed_query(self, query: str) -> List[float]:
+        if query not in self.cache:
+            if self._base is None:
+                self._base = self._factory()
+            t0 = time.perf_counter()
+            self.cache[query] = self._base.embed_query(query)
+            self.latencies_ms.append((time.perf_counter() - t0) * 1000)
+        return self.cache[query]
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self._all, f)
+
+
+def _azure_embeddings(deployment: str, dims: Optional[int]):
+    from langchain_openai import AzureOpenAIEmbeddings
+    return AzureOpenAIEmbeddings(
+        azure_deployment=deployment,
+        api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2025-01-01-preview"),
+        dimensions=dims)
+
+
+def _citation_key(source, page) -> tuple:
+    return (os.path.basename(source) if isinstance(source, str) else source, str(page))
+
+
+class SnapshotRAGApp(RAGApp):
+    """
+    컬렉션 스냅샷을 메모리에 올려 Atlas 검색을 대신하는 RAGApp.
+    hybrid_search/_rrf_fuse는 그대로 쓰고 두 검색 단계만 로컬 구현으로 바꾼다.
+    """
+
+    def __init__(self, snapshot_path: str, emb_cache_path: str):
+        # RAGApp.__init__은 Mongo/LLM 클라이언트를 만들므로 호출하지 않음
+        self.EMB_PATH = os.getenv("MONGO_EMBEDDING_PATH", "embedding")
+        emb_dims = os.getenv("AZURE_OPENAI_EMB_DIMENSIONS")
+        self.EMB_DIMS = int(emb_dims) if emb_dims else None
+        self.playback = None
+        deployment = os.getenv("AZURE_OPENAI_EMB_DEPLOYMENT", "text-embedding-3-small")
+        self.emb = QueryEmbeddingCache(lambda: _azure_embeddings(deployment, self.EMB_DIMS), emb_cache_path,
+                                       model_key=f"{deployment}:{self.EMB_DIMS or 'default'}")
+
+        self.docs = [d for d in iter_records(snapshot_path)]
+        vecs = [d.pop(self.EMB_PATH, None) for d in self.docs]
+        self.vec_ids = [i for i, v in enumerate(vecs) if v]  # 임베딩 없는 청크는 벡터 검색에서 제외
+        vecs = [vecs[i] for i in self.vec_ids]
+        self.vecs = np.asarray(vecs, dtype=np.float32) if np is not None else vecs
+
+        # BM25 역색인
+        self.tfs = [Counter(_terms(d.get("content"))) for d in self.docs]
+        self.lens = [sum(tf.values()) for tf in self.tfs]
+        self.avg_len = (sum(self.lens) / len(self.lens)) if self.lens else 0.0
+        self.postings = defaultdict(list)
+        for i, tf in enumerate(self.tfs):
+            for t in tf:
+                self.postings[t].append(i)
+
+
+    @staticmethod
+    def _match(d: Dict, filters: Optional[Dict]) -> bool:
+        return not filters or all(d.get(key) == val for key, val in filters.items())
+
+    def _atlas_text_search(self, query: str, k: int = 20, filters: Optional[Dict]=None, paths=["content"]):
+        n, k1, b = len(self.docs), 1.2, 0.75
+        scores: Dict[int, float] = defaultdict(float)
+        for t in set(_terms(query)):
+            idx = self.postings.get(t, [])
+            if not idx: continue
+            idf = math.log(1 + (n - len(idx) + 0.5) / (len(idx) + 0.5))
+            for i in idx:
+                tf = self.tfs[i][t]
+                scores[i] += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * self.lens[i] / self.avg_len))
+        ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+        out = [{**self.docs[i], "_lexScore": s} for i, s in ranked if self._match(self.docs[i], filters)]
+        return out[:k]
+
+    def _atlas_vector_search(self, query: str, k: int = 20, num_candidates: int = 400, filters: Optional[Dict]=None):
+        # 전수 코사인 유사도 (저장 벡터는 정규화돼 있으므로 내적)
+        qvec = self.emb.embed_query(query)
+        dims = len(self.vecs[0]) if self.vec_ids else len(qvec)
+        if len(qvec) < dims:
+            raise ValueError(f"질의 임베딩({len(qvec)}차원)이 스냅샷 {self.EMB_PATH}({dims}차원)보다 짧습니다. "
+                             "AZURE_OPENAI_EMB_DIMENSIONS와 MONGO_EMBEDDING_PATH를 확인하세요.")
+        if len(qvec) > dims:
+            qvec = RAGApp.shorten_embedding(qvec, dims)
+        if np is not None:
+            sims = (self.vecs @ np.asarray(qvec, dtype=np.float32)).tolist() if self.vec_ids else []
+        else:
+            sims = [sum(a*b for a, b in zip(v, qvec)) for v in self.vecs]
+        order = sorted(range(len(sims)), key=lambda j: sims[j], reverse=True)
+        out = []
+        for j in order:
+            d = self.docs[self.vec_ids[j]]
+            if self._match(d, filters):
+                out.append({**d, "_semScore": sims[j]})
+                if len(out) >= k: break
+        return out
+
+
+def export_snapshot(rag_app: RAGApp, path: str) -> int:
+    fields = {"_id": 1, "content": 1, "source": 1, "page_number": 1, "download_link": 1, "metadata": 1,
+              rag_app.EMB_PATH: 1}
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    n = 0
+    with gzip.open(path, "wt", encoding="utf-8") if path.endswith(".gz") else open(path, "w", encoding="utf-8") as f:
+        for d in rag_app.col.find({}, fields):
+            f.write(json.dumps(d, ensure_ascii=False, default=str) + "\n")
+            n += 1
+    return n
+
+
+def evaluate(rag_app: RAGApp, golden: List[Dict], k: int, num_candidates: int, rrf_k: int) -> Dict:
+    recalls, rrs, latencies = [], [], []
+    for item in golden:
+        expected = {_citation_key(e["source"], e.get("page_number")) for e in item["expected"]}
+        t0 = time.perf_counter()
+        docs = rag_app.hybrid_search(item["question"], k=k, num_candidates=num_candidates, rrf_k=rrf_k)
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+        retrieved = [_citation_key(d.get("source"), d.get("page_number")) for d in docs]
+        recalls.append(len(expected & set(retrieved)) / len(expected))
+        rank = next((i for i, key in enumerate(retrieved, 1) if key in expected), None)
+        rrs.append(1.0 / rank if rank else 0.0)
+    return {
+        "k": k, "num_candidates": num_candidates, "rrf_k": rrf_k,
+        "recall": sum(recalls) / len(recalls), "mrr": sum(rrs) / len(rrs),
+        "p50_ms": percentile(latencies, 50), "p95_ms": percentile(latencies, 95),
+    }
+
+
+def mark_pareto(results: List[Dict]) -> None:
+    """recall은 높을수록, p50 지연은 낮을수록 좋은 기준으로 지배되지 않는 구성을 표시"""
+    for r in results:
+        r["pareto"] = not any(
+            o["recall"] >= r["recall"] and o["p50_ms"] <= r["p50_ms"]
+            and (o["recall"] > r["recall"] or o["p50_ms"] < r["p50_ms"])
+            for o in results
+        )
+
+
+def print_table(results: List[Dict], recall_target: Optional[float]) -> None:
+    print(f"\n{'k':>3} {'cand':>5} {'rrf_k':>5} {'recall@k':>9} {'MRR':>6} {'p50(ms)':>9} {'p95(ms)':>9}  pareto")
+    for r in sorted(results, key=lambda r: r["p50_ms"]):
+        print(f"{r['k']:>3} {r['num_candidates']:>5} {r['rrf_k']:>5} {r['recall']:>9.3f} {r['mrr']:>6.3f} "
+              f"{r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f}  {'*' if r['pareto'] else ''}")
+
+    if recall_target is not None:
+        ok = [r for r in results if r["recall"] >= recall_target]
+        if ok:
+            best = min(ok, key=lambda r: r["p50_ms"])
+            print(f"\n✅ recall >= {recall_target}: 가장 빠른 구성 k={best['k']}, "
+                  f"num_candidates={best['num_candidates']}, rrf_k={best['rrf_k']} (p50 {best['p50_ms']:.1f}ms)")
+        else:
+            print(f"\n❌ recall >= {recall_target}를 만족하는 구성이 없습니다.")
+
+
+def _ints(s: str) -> List[int]:
+    return [int(x) for x in s.split(",") if x.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="hybrid_search 품질/지연시간 파라미터 그리드 평가")
+    parser.add_argument("golden", help="골든셋 JSONL (question, expected[source, page_number])")
+    parser.add_argument("--k", default="5", help="쉼표 구분, 예: 3,5,8")
+    parser.add_argument("--num-candidates", default="800")
+    parser.add_argument("--rrf-k", default="60")
+    parser.add_argument("--recall-target", type=float)
+    parser.add_argument("--snapshot", help="로컬 스냅샷 (.jsonl/.jsonl.gz); 미지정 시 라이브 Atlas")
+    parser.add_argument("--emb-cache", default="snapshot/query_embeddings.json", help="스냅샷 모드 질의 임베딩 캐시")
+    parser.add_argument("--export-snapshot", help="라이브 컬렉션을 이 경로로 내보내고 종료")
+    parser.add_argument("--json-out", help="결과를 JSON으로 저장")
+    args = parser.parse_args()
+
+    # hybrid_search만 평가하므로 라이브 모드에서도 라우터 어휘 샘플링은 생략
+    os.environ["ROUTER_ENABLED"] = "false"
+
+    if args.export_snapshot:
+        n = export_snapshot(get_app(), args.export_snapshot)
+        print(f"✅ {n}개 문서를 {args.export_snapshot}로 내보냈습니다.")
+        return
+
+    golden = [g for g in iter_records(args.golden) if g.get("question") and g.get("expected")]
+    if not golden:
+        print(f"❌ No golden questions found in {args.golden}")
+        return
+
+    if args.snapshot:
+        rag_app = SnapshotRAGApp(args.snapshot, args.emb_cache)
+    else:
+        rag_app = get_app()
+        live_emb = rag_app.emb
+        rag_app.emb = QueryEmbeddingCache(lambda: live_emb)
+        rag_app.SHADOW_RATE = 0.0  # 섀도 쿼리가 Atlas 부하/지연 측정을 오염시키지 않도록
+
+    # 질의 임베딩을 미리 한 번씩 계산 → 그리드 측정에는 검색 + 융합 시간만 남음
+    for g in golden:
+        rag_app.emb.embed_query(g["question"])
+    emb_ms = rag_app.emb.latencies_ms
+    embedding = {"calls": len(emb_ms), "p50_ms": percentile(emb_ms, 50), "p95_ms": percentile(emb_ms, 95)}
+    print(f"질의 임베딩 (구성별 지연시간에서 제외): {embedding['calls']}회 호출, "
+          f"p50={embedding['p50_ms']:.1f}ms p95={embedding['p95_ms']:.1f}ms")
+    rag_app.emb.save()
+
+    # 첫 호출의 연결 워밍업이 지연시간 측정에 섞이지 않도록
+    rag_app.hybrid_search(golden[0]["question"], k=1)
+
+    results = []
+    for k, cand, rrf_k in itertools.product(_ints(args.k), _ints(args.num_candidates), _ints(args.rrf_k)):
+        r = evaluate(rag_app, golden, k, cand, rrf_k)
+        print(f"k={k} num_candidates={cand} rrf_k={rrf_k}: recall@k={r['recall']:.3f} "
+              f"MRR={r['mrr']:.3f} p50={r['p50_ms']:.1f}ms")
+        results.append(r)
+
+    mark_pareto(results)
+    print_table(results, args.recall_target)
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"embedding": embedding, "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
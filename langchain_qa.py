@@ -1,6 +1,7 @@
 # rag_app.py
-import os, json, re
-from typing import Dict, List, Optional
+import os, json, re, math, time, random, logging, threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 from functools import lru_cache
 from dotenv import load_dotenv
 from pymongo import MongoClient
@@ -10,6 +11,11 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnableLambda, RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
 
+from traffic_capture import record_stage, load_playback
+from query_router import QueryRouter, ROUTE_CANNED, ROUTE_CHEAP
+
+logger = logging.getLogger(__name__)
+
 class RAGApp:
     def __init__(self):
         load_dotenv()  # 프로세스당 1회면 충분 (여러 번 호출돼도 문제 없음)
@@ -20,6 +26,17 @@ class RAGApp:
         self.COLL_NAME   = os.getenv("MONGO_COLL", "documents")
         self.VECTOR_IDX  = os.getenv("MONGO_VECTOR_INDEX", "vector_index")
         self.TEXT_IDX    = os.getenv("MONGO_TEXT_INDEX", "text_index")
+        self.EMB_PATH    = os.getenv("MONGO_EMBEDDING_PATH", "embedding")
+        emb_dims = os.getenv("AZURE_OPENAI_EMB_DIMENSIONS")  # 미설정 시 모델 기본 차원
+        self.EMB_DIMS    = int(emb_dims) if emb_dims else None
+
+        # 축소 차원 벡터 섀도 인덱스 (migrate_embeddings.py로 생성) — 설정 시 비교 로그만 남김
+        self.SHADOW_VECTOR_IDX = os.getenv("MONGO_SHADOW_VECTOR_INDEX")
+        self.SHADOW_EMB_PATH   = os.getenv("MONGO_SHADOW_EMBEDDING_PATH", "embedding_short")
+        self.SHADOW_EMB_DIMS   = int(os.getenv("SHADOW_EMB_DIMENSIONS", "512"))
+        # 섀도 쿼리는 Atlas 부하를 더하므로 일부만 샘플링, 대기 중인 섀도 쿼리 수도 제한
+        self.SHADOW_RATE       = float(os.getenv("VECTOR_SHADOW_SAMPLE_RATE", "0.1"))
+        self.SHADOW_MAX_PENDING = int(os.getenv("VECTOR_SHADOW_MAX_PENDING", "4"))
 
         api_ver = os.getenv("AZURE_OPENAI_API_VERSION", "2025-01-01-preview")
         chat_dep = os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT", "gpt-4.1-mini")
@@ -30,7 +47,21 @@ class RAGApp:
         self.col   = self.mongo[self.DB_NAME][self.COLL_NAME]
 
         self.llm = AzureChatOpenAI(azure_deployment=chat_dep, api_version=api_ver, temperature=0.1)
-        self.emb = AzureOpenAIEmbeddings(azure_deployment=emb_dep, api_version=api_ver)
+        self.emb = AzureOpenAIEmbeddings(azure_deployment=emb_dep, api_version=api_ver, dimensions=self.EMB_DIMS)
+
+        # 섀도 쿼리는 응답 지연에 영향이 없도록 백그라운드에서 실행
+        if self.SHADOW_VECTOR_IDX and self.EMB_DIMS and self.SHADOW_EMB_DIMS >= self.EMB_DIMS:
+            logger.warning("섀도 차원이 기본 차원보다 작지 않아 섀도 모드를 끕니다.")
+            self.SHADOW_VECTOR_IDX = None
+        self._shadow_pool = ThreadPoolExecutor(max_workers=2) if self.SHADOW_VECTOR_IDX else None
+        self._shadow_slots = threading.BoundedSemaphore(self.SHADOW_MAX_PENDING)
+        self._shadow_dropped = 0
+
+        # QNA_PLAYBACK_PATH 설정 시 캡처된 업스트림 응답으로 재생 (오프라인 리플레이)
+        self.playback = load_playback()
+
+        # 검색 전 라우팅 (재생 모드에서는 기록된 결정을 재생하므로 어휘 불필요)
+        self.router = QueryRouter(self.col if self.playback is None else None)
 
         # --- prompt (한 번만) ---
         SYSTEM = ("너는 제공된 컨텍스트에서만 근거를 찾아 간결하고 정확하게 답한다. "
@@ -90,6 +121,21 @@ JSON만 출력:
             })
         return cites
 
+    # ---------- 업스트림 호출 (캡처/재생) ----------
+    def _upstream(self, stage: str, question: str, call):
+        if self.playback is not None:
+            return self.playback.lookup(question, stage)
+        result = call()
+        record_stage(stage, result)
+        return result
+
+    @staticmethod
+    def shorten_embedding(vec: List[float], dims: int) -> List[float]:
+        # text-embedding-3의 축소 차원 출력 = 앞쪽 dims개 성분을 잘라 L2 정규화한 것과 동일
+        head = vec[:dims]
+        norm = math.sqrt(sum(x*x for x in head)) or 1.0
+        return [x/norm for x in head]
+
     # ---------- 검색 (요청마다) ----------
     def _atlas_text_search(self, query: str, k: int = 20, filters: Optional[Dict]=None, paths=["content"]):
         pipe = [{"$search": {"index": self.TEXT_IDX, "text": {"query": query, "path": paths}}}]
@@ -99,16 +145,64 @@ JSON만 출력:
                           "_lexScore": {"$meta":"searchScore"}}},
             {"$limit": k}
         ]
-        return list(self.col.aggregate(pipe))
+        return self._upstream("text_search", query, lambda: list(self.col.aggregate(pipe)))
 
-    def _atlas_vector_search(self, query: str, k: int = 20, num_candidates: int = 400, filters: Optional[Dict]=None):
-        qvec = self.emb.embed_query(query)
-        pipe = [{"$vectorSearch": {"index": self.VECTOR_IDX, "path": "embedding",
+    def _vector_pipeline(self, index: str, path: str, qvec: List[float], k: int, num_candidates: int,
+                         filters: Optional[Dict]=None) -> List[Dict]:
+        pipe = [{"$vectorSearch": {"index": index, "path": path,
                                    "queryVector": qvec, "numCandidates": num_candidates, "limit": k}}]
         if filters: pipe.append({"$match": filters})
         pipe += [{"$project": {"_id":1, "content":1, "source":1, "page_number":1, "download_link":1,
                                "_semScore":{"$meta":"vectorSearchScore"}}}]
-        return list(self.col.aggregate(pipe))
+        return pipe
+
+    def _atlas_vector_search(self, query: str, k: int = 20, num_candidates: int = 400, filters: Optional[Dict]=None):
+        def call():
+            qvec = self.emb.embed_query(query)
+            t0 = time.perf_counter()
+            docs = list(self.col.aggregate(
+                self._vector_pipeline(self.VECTOR_IDX, self.EMB_PATH, qvec, k, num_candidates, filters)))
+            if self._shadow_pool is not None and random.random() < self.SHADOW_RATE:
+                self._submit_shadow(qvec, [d["_id"] for d in docs], (time.perf_counter()-t0)*1000,
+                                    k, num_candidates, filters)
+            return docs
+        return self._upstream("vector_search", query, call)
+
+    def _submit_shadow(self, *args):
+        # 대기열이 가득 차면 샘플을 버림 (부하 상황에서 백로그/메모리가 무한히 늘지 않도록)
+        if not self._shadow_slots.acquire(blocking=False):
+            self._shadow_dropped += 1
+            if self._shadow_dropped % 100 == 1:
+                logger.warning(f"섀도 벡터 검색 샘플 누적 {self._shadow_dropped}건 버림 (대기열 가득 참)")
+            return
+        try:
+            self._shadow_pool.submit(self._shadow_vector_search, *args)
+        except Exception:
+            self._shadow_slots.release()
+            raise
+
+    def _shadow_vector_search(self, qvec: List[float], primary_ids: List, primary_ms: float,
+                              k: int, num_candidates: int, filters: Optional[Dict]=None):
+        # 섀도 인덱스로 같은 질의를 보내 지연시간/결과 겹침을 로그로 남김 (응답에는 사용 안 함)
+        try:
+            svec = self.shorten_embedding(qvec, self.SHADOW_EMB_DIMS)
+            t0 = time.perf_counter()
+            shadow = list(self.col.aggregate(
+                self._vector_pipeline(self.SHADOW_VECTOR_IDX, self.SHADOW_EMB_PATH, svec, k, num_candidates, filters)))
+            shadow_ms = (time.perf_counter()-t0)*1000
+            shadow_ids = [d["_id"] for d in shadow]
+            top = min(5, len(primary_ids))
+            logger.info("vector_shadow " + json.dumps({
+                "k": k, "num_candidates": num_candidates, "dims": self.SHADOW_EMB_DIMS,
+                "primary_ms": round(primary_ms, 1), "shadow_ms": round(shadow_ms, 1),
+                "overlap": round(len(set(primary_ids) & set(shadow_ids)) / len(primary_ids), 4) if primary_ids else None,
+                "overlap_top5": round(len(set(primary_ids[:top]) & set(shadow_ids[:top])) / top, 4) if top else None,
+                "dropped": self._shadow_dropped,
+            }))
+        except Exception as e:
+            logger.warning(f"섀도 벡터 검색 실패: {e}")
+        finally:
+            self._shadow_slots.release()
 
     @staticmethod
     def _rrf_fuse(lex_docs: List[Dict], sem_docs: List[Dict], k: int = 60, topk: int = 6) -> List[Dict]:
@@ -127,20 +221,21 @@ JSON만 출력:
         for d in docs: d.setdefault("_lexScore", 0.0); d.setdefault("_semScore", 0.0)
         return docs
 
-    def hybrid_search(self, query: str, k: int = 6, num_candidates: int = 800, filters: Optional[Dict]=None):
+    def hybrid_search(self, query: str, k: int = 6, num_candidates: int = 800, filters: Optional[Dict]=None,
+                      rrf_k: int = 60):
         sem = self._atlas_vector_search(query, k=max(k*5, 20), num_candidates=num_candidates, filters=filters)
         lex = self._atlas_text_search(query, k=max(k*5, 20), filters=filters)
         if not sem and not lex: return []
         if not sem: return lex[:k]
         if not lex: return sem[:k]
-        return self._rrf_fuse(lex, sem, k=60, topk=k)
+        return self._rrf_fuse(lex, sem, k=rrf_k, topk=k)
 
     # ---------- judge (질문/답변만) ----------
     def judge_qa(self, question: str, answer: str) -> Dict:
         if not answer or not answer.strip():
             return {"success": False}
         msgs = self.judge_prompt.format_messages(question=question, answer=answer)
-        raw  = self.llm.invoke(msgs).content
+        raw  = self._upstream("judge_llm", question, lambda: self.llm.invoke(msgs).content)
         try:
             j = json.loads(raw)
         except Exception:
@@ -149,25 +244,42 @@ JSON만 출력:
         return j
 
     # ---------- 최종 API ----------
-    def answer_json(self, question: str) -> Dict:
-        docs = self.hybrid_search(question, k=5)
+    def answer_with_docs(self, question: str) -> Tuple[Dict, List[Dict]]:
+        # 사전 계산 작업(answer_store)은 근거 문서의 source/page_number가 필요
+        # 라우팅 결정도 단계로 기록해 재생 시 캡처 당시 경로를 그대로 따름
+        decision = self._upstream("route", question, lambda: self.router.route(question))
+        if decision["route"] == ROUTE_CANNED:
+            ai = self.router.canned_message(decision["reason"])
+            return {
+                "success": False,
+                "messages": [{"HumanMessage": question}, {"AIMessage": ai}],
+                "citations": []
+            }, []
+        if decision["route"] == ROUTE_CHEAP:
+            # 약관 용어만으로 된 짧은 질문: 텍스트 검색으로 충분하므로 임베딩/벡터 검색 생략
+            docs = self._atlas_text_search(question, k=3)
+        else:
+            docs = self.hybrid_search(question, k=5)
         context = self._format_context(docs)
         msgs = self.prompt.format_messages(question=question, context=context)
-        ai   = self.llm.invoke(msgs).content
+        ai   = self._upstream("answer_llm", question, lambda: self.llm.invoke(msgs).content)
         return {
             "success": self.judge_qa(question, ai)["success"],
             "messages": [{"HumanMessage": question}, {"AIMessage": ai}],
             "citations": self._build_citations(docs)
-        }
+        }, docs
+
+    def answer_json(self, question: str) -> Dict:
+        return self.answer_with_docs(question)[0]
 
 
 @lru_cache(maxsize=1)
 def get_app() -> RAGApp:
     return RAGApp()
 
-app = get_app()
+# import만으로는 클라이언트/라우터를 만들지 않음 (오프라인 스크립트·테스트는 필요할 때 get_app())
 if __name__ == "__main__":
-    # ← 초기화 1회
+    app = get_app()  # ← 초기화 1회
     q = "가족과 형제·자매 한정운전 특별약관 알려줘"  # ← 요청마다 바뀜
     result = app.answer_json(q)  # ← 요청마다 실행
     result_json = json.dumps(result, ensure_ascii=False, indent=2)
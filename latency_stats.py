@@ -0,0 +1,12 @@
+# latency_stats.py
+# 부하 테스트(replay.py)와 검색 평가(eval_retrieval.py)가 함께 쓰는 지연시간 통계
+from typing import List
+
+
+def percentile(values: List[float], p: float) -> float:
+    """최근접 순위(nearest-rank) 백분위수. 빈 목록이면 0.0"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(p / 100.0 * len(ordered))) - 1))
+    return ordered[idx]
@@ -25,6 +25,14 @@ except ImportError as e:
     logger.error(f"LangChain QA 모듈 로드 실패: {e}")
     raise
 
+from traffic_capture import get_recorder
+from answer_store import get_answer_store
+
+# 첫 요청이 클라이언트 생성을 기다리지 않도록 서버 시작 시 1회 초기화
+# (사전 계산 답변 스냅샷도 이때부터 백그라운드 로드)
+get_app()
+get_answer_store()
+
 app = FastAPI(
     title="AI Q&A Service",
     description="LangChain과 RAG를 활용한 질의응답 서비스",
@@ -109,7 +117,16 @@ async def qna_endpoint(request: QnARequest):
         
         # langchain_qa.py의 RAGApp 객체 활용 (캐싱된 객체 사용)
         rag_app = get_app()
-        result = rag_app.answer_json(request.input_message)
+        # 샘플링된 요청은 단계별 업스트림 응답과 함께 캡처 (QNA_CAPTURE_ENABLED)
+        with get_recorder().capture(request.input_message) as capture:
+            # 자주 묻는 질문은 사전 계산된 답변으로 바로 응답 (precompute_answers.py)
+            result = get_answer_store().lookup(request.input_message)
+            if result is not None:
+                logger.info("Served precomputed answer")
+            else:
+                result = rag_app.answer_json(request.input_message)
+            if capture is not None:
+                capture["response"] = result
         
         if result.get("success"):
             logger.info("Successfully generated response")
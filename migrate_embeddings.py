@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+기존 전체 차원 임베딩에서 축소 차원 벡터를 만들어 별도 필드/인덱스에 기록하는 마이그레이션
+
+text-embedding-3 계열은 앞쪽 성분을 잘라 L2 정규화하면 dimensions 파라미터로
+받은 임베딩과 같으므로, 임베딩 API를 다시 호출하지 않고 저장된 벡터로 계산한다.
+
+사용 예:
+    # embedding(1536) → embedding_short(512) 기록 후 섀도 인덱스 생성
+    python migrate_embeddings.py --dimensions 512 --create-index
+
+    # 서버는 섀도 모드로 띄워 vector_shadow 로그(지연시간/겹침)를 비교
+    MONGO_SHADOW_VECTOR_INDEX=vector_index_short SHADOW_EMB_DIMENSIONS=512 uvicorn main:app
+
+    # 전환: 기본 인덱스를 축소 차원으로
+    MONGO_VECTOR_INDEX=vector_index_short MONGO_EMBEDDING_PATH=embedding_short AZURE_OPENAI_EMB_DIMENSIONS=512
+"""
+
+import argparse
+import logging
+import os
+
+from pymongo import UpdateOne
+
+from langchain_qa import RAGApp, get_app
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def migrate(col, source_field: str, target_field: str, dims: int, batch_size: int, force: bool) -> int:
+    query = {source_field: {"$exists": True}}
+    if not force:
+        query[target_field] = {"$exists": False}
+
+    ops, done = [], 0
+    for d in col.find(query, {source_field: 1}, batch_size=batch_size):
+        vec = d[source_field]
+        if len(vec) < dims:
+            logger.warning(f"{d['_id']}: 원본 차원({len(vec)})이 목표 차원보다 작아 건너뜀")
+            continue
+        ops.append(UpdateOne({"_id": d["_id"]}, {"$set": {target_field: RAGApp.shorten_embedding(vec, dims)}}))
+        if len(ops) >= batch_size:
+            col.bulk_write(ops, ordered=False)
+            done += len(ops); ops = []
+            logger.info(f"{done}건 기록")
+    if ops:
+        col.bulk_write(ops, ordered=False)
+        done += len(ops)
+    return done
+
+
+def create_vector_index(col, name: str, path: str, dims: int) -> None:
+    # 필터 필드는 README의 vector_index 정의를 그대로 따름 (filters 인자는 $vectorSearch 뒤의
+    # $match로 적용되므로 이 필드들에 의존하지 않음 — 두 인덱스 정의를 같게 유지하려는 것)
+    col.database.command({
+        "createSearchIndexes": col.name,
+        "indexes": [{
+            "name": name,
+            "type": "vectorSearch",
+            "definition": {"fields": [
+                {"type": "vector", "path": path, "numDimensions": dims, "similarity": "cosine"},
+                {"type": "filter", "path": "metadata.category"},
+                {"type": "filter", "path": "metadata.document_type"},
+            ]},
+        }],
+    })
+    logger.info(f"벡터 인덱스 생성 요청: {name} ({path}, {dims}차원) — Atlas에서 빌드 완료까지 대기 필요")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="축소 차원 임베딩 섀도 필드/인덱스 마이그레이션")
+    parser.add_argument("--dimensions", type=int, default=512)
+    parser.add_argument("--source-field", default="embedding")
+    parser.add_argument("--target-field", default="embedding_short")
+    parser.add_argument("--index-name", default="vector_index_short")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--force", action="store_true", help="이미 기록된 문서도 다시 계산")
+    parser.add_argument("--create-index", action="store_true", help="섀도 벡터 인덱스 생성")
+    args = parser.parse_args()
+
+    os.environ["ROUTER_ENABLED"] = "false"  # 라우팅을 쓰지 않으므로 어휘 샘플링 생략
+    col = get_app().col
+    done = migrate(col, args.source_field, args.target_field, args.dimensions, args.batch_size, args.force)
+    logger.info(f"완료: {done}건 → {args.target_field} ({args.dimensions}차원)")
+    if args.create_index:
+        create_vector_index(col, args.index_name, args.target_field, args.dimensions)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+자주 묻는 질문의 답변을 미리 계산해 사전 계산 답변 컬렉션에 저장하는 작업
+
+사용 예:
+    # 캡처 로그에서 상위 50개 질문
+    python precompute_answers.py build --from-capture 'captures/qna_capture.*.jsonl.gz' --top-n 50
+
+    # 큐레이션된 질문 목록 (한 줄에 하나)
+    python precompute_answers.py build --questions curated_questions.txt
+
+    # 원문이 바뀐 항목 stale 처리 후 재생성 (source는 파일명 또는 저장된 전체 경로)
+    python precompute_answers.py invalidate 자동차보험_기본약관.pdf:23
+    python precompute_answers.py refresh
+"""
+
+import argparse
+import logging
+import os
+from collections import Counter
+from typing import List
+
+from answer_store import AnswerStore
+from langchain_qa import get_app
+from traffic_capture import iter_records
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def top_questions_from_capture(path: str, top_n: int) -> List[str]:
+    """정규화한 질문 기준 빈도 상위 N개 (대표 문구는 가장 많이 쓰인 원문)"""
+    counts: Counter = Counter()
+    surface = {}
+    for rec in iter_records(path):
+        q = (rec.get("question") or "").strip()
+        if not q:
+            continue
+        key = AnswerStore.normalize_question(q)
+        counts[key] += 1
+        surface.setdefault(key, Counter())[q] += 1
+    return [surface[key].most_common(1)[0][0] for key, _ in counts.most_common(top_n)]
+
+
+def load_curated(path: str) -> List[str]:
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def build(store: AnswerStore, questions: List[str]) -> None:
+    rag_app = get_app()
+    stored = skipped = 0
+    for q in questions:
+        response, docs = rag_app.answer_with_docs(q)
+        # 심판을 통과하지 못한 답변은 캐시하지 않음 (기존 항목도 제거)
+        if not response["success"]:
+            store.delete(q)
+            skipped += 1
+            logger.info(f"건너뜀 (judge 실패): {q}")
+            continue
+        store.put(q, response, docs)
+        stored += 1
+        logger.info(f"저장: {q}")
+    logger.info(f"완료: 저장 {stored}건, 건너뜀 {skipped}건")
+
+
+def parse_source_spec(spec: str):
+    """'파일.pdf:23' → ('파일.pdf', 23), '파일.pdf' → ('파일.pdf', None)"""
+    source, sep, page = spec.rpartition(":")
+    if sep and page.isdigit():
+        return source, int(page)
+    return spec, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="사전 계산 답변 생성/무효화")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build", help="질문 목록의 답변을 계산해 저장")
+    p_build.add_argument("--from-capture", help="트래픽 캡처 파일 또는 glob 패턴 (.jsonl/.jsonl.gz)")
+    p_build.add_argument("--questions", help="큐레이션된 질문 파일 (한 줄에 하나)")
+    p_build.add_argument("--top-n", type=int, default=50)
+
+    p_inv = sub.add_parser("invalidate", help="변경된 원문을 근거로 한 항목을 stale 처리")
+    p_inv.add_argument("sources", nargs="+", help="source 또는 source:page_number (파일명 또는 전체 경로)")
+
+    sub.add_parser("refresh", help="stale 항목과 원문 지문이 바뀐 항목을 재생성")
+
+    args = parser.parse_args()
+    # 사전 계산 답변은 라우터 분기 없이 항상 전체 파이프라인으로 만들고, 어휘 샘플링도 생략
+    os.environ["ROUTER_ENABLED"] = "false"
+    store = AnswerStore(get_app(), background=False)  # /qna용 메모리 스냅샷은 필요 없음
+
+    if args.command == "build":
+        questions: List[str] = []
+        if args.from_capture:
+            questions += top_questions_from_capture(args.from_capture, args.top_n)
+        if args.questions:
+            questions += load_curated(args.questions)
+        if not questions:
+            parser.error("--from-capture 또는 --questions 중 하나는 필요합니다.")
+        build(store, list(dict.fromkeys(questions)))
+    elif args.command == "invalidate":
+        count = store.invalidate_sources(parse_source_spec(s) for s in args.sources)
+        if count == 0:
+            logger.warning("stale 처리된 항목이 없습니다. source 값(파일명/경로)과 page_number를 확인하세요.")
+        else:
+            logger.info(f"stale 처리: {count}건")
+    else:
+        stale = store.stale_questions()
+        logger.info(f"재생성 대상: {len(stale)}건")
+        build(store, stale)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# query_router.py
+import os, re, json, math, time, logging, threading
+from collections import Counter
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ROUTE_ANSWER = "answer"   # 정상 파이프라인 (하이브리드 검색 + LLM)
+ROUTE_CHEAP  = "cheap"    # 텍스트 검색만, 짧은 컨텍스트 (약관 용어만으로 된 짧은 질문)
+ROUTE_CANNED = "canned"   # 검색/LLM 없이 고정 응답
+
+CANNED_MESSAGES = {
+    "empty":      "질문 내용을 입력해 주세요.",
+    "test":       "테스트 요청이 정상적으로 수신되었습니다.",
+    "greeting":   "안녕하세요! 보험 약관에 대해 궁금한 점을 질문해 주세요.",
+    "off_domain": "보험 약관과 관련된 질문에만 답변할 수 있습니다.",
+}
+
+_TOKEN_RE    = re.compile(r"[가-힣A-Za-z0-9]+")
+# 규칙은 입력 전체가 테스트 문구/인사말일 때만 적용 ("테스트 주행 중 사고", "하이패스" 등은 통과)
+_TEST_RE     = re.compile(
+    r"^(테스트|test)( ?(질문|메시지|요청|question|message|request|query))?( ?입니다)?[.!?~ ]*$", re.IGNORECASE)
+_GREETING_RE = re.compile(
+    r"^(안녕(하세요|하십니까)?|하이|헬로|반가워요|반갑습니다|고마워(요)?|감사합니다|감사해요"
+    r"|(hello|hi|hey)( there| everyone)?|thanks|thank you)[!.?~ ]*$", re.IGNORECASE)
+
+# 질문 어미/의문사 토큰: 코퍼스(약관 문체)에 없어도 도메인 적합도를 깎지 않도록 제외
+_QUESTION_TOKENS = {
+    "얼마", "얼마야", "얼마에요", "얼마예요", "얼마인가요", "얼마나", "어떻게", "어떤", "뭐야", "뭐예요",
+    "무엇", "무엇인가요", "무엇이", "왜", "언제", "어디", "누가", "알려줘", "알려주세요", "알려줄래",
+    "설명해줘", "설명해주세요", "계산해", "계산해줘", "해줘", "주세요", "되나요", "돼", "돼요",
+    "있나요", "있어", "있어요", "인가요", "가요", "나요", "요",
+}
+
+
+def _terms(text: str) -> List[str]:
+    """의문사/어미를 뺀 내용어 토큰"""
+    return [tok for tok in _TOKEN_RE.findall(text.lower()) if tok not in _QUESTION_TOKENS]
+
+
+def _bigrams(text: str) -> List[str]:
+    grams = []
+    for tok in _terms(text):
+        if len(tok) == 1:
+            grams.append(tok)
+        else:
+            grams.extend(tok[i:i+2] for i in range(len(tok) - 1))
+    return grams
+
+
+class QueryRouter:
+    """
+    검색 전에 질문을 가볍게 분류해 불필요한 임베딩/Atlas/LLM 호출을 건너뛴다.
+    어휘 규칙(빈 입력/테스트/인사)과, 코퍼스 샘플에서 만든 문자 bigram 어휘에
+    대한 IDF 가중 커버리지로 도메인 적합도를 판단한다.
+    """
+
+    def __init__(self, col, enabled: Optional[bool] = None, background: bool = True):
+        self.col = col
+        self.enabled = enabled if enabled is not None else \
+            os.getenv("ROUTER_ENABLED", "true").lower() == "true"
+        self.sample_size   = int(os.getenv("ROUTER_VOCAB_SAMPLE", "2000"))
+        # 커버리지는 "코퍼스에 등장하는 질문 bigram의 IDF 가중 비율" (미등장 bigram은 가중치 1).
+        # 커버리지가 낮은 질문은 구어체/동의어("렌터카", "자차")로 물은 도메인 질문일 수 있어
+        # 의미 검색이 가장 필요하므로 항상 하이브리드 경로로 보낸다.
+        # off_domain 차단은 실제 route_decision 로그로 임계값을 정하기 전까지 기본 꺼짐(0.0).
+        self.min_coverage  = float(os.getenv("ROUTER_MIN_COVERAGE", "0.0"))
+        # cheap(텍스트 검색만)은 거의 모든 bigram이 코퍼스에 있고 내용어가 몇 개 안 되는 질문만
+        self.cheap_coverage  = float(os.getenv("ROUTER_CHEAP_COVERAGE", "0.9"))
+        self.cheap_max_terms = int(os.getenv("ROUTER_CHEAP_MAX_TERMS", "3"))
+        self.retry_sec     = float(os.getenv("ROUTER_VOCAB_RETRY_SEC", "30"))
+
+        self._df: Counter = Counter()
+        self._n_docs = 0
+        if self.enabled and col is not None and background:
+            # 첫 요청이 코퍼스 샘플링을 기다리지 않도록 시작 시 백그라운드에서 구축
+            threading.Thread(target=self._build_loop, name="router-vocab", daemon=True).start()
+
+    # ---------- 코퍼스 어휘 (시작 시 1회, 실패 시 재시도) ----------
+    def build_vocab(self) -> None:
+        df: Counter = Counter()
+        n = 0
+        for d in self.col.aggregate([{"$sample": {"size": self.sample_size}},
+                                     {"$project": {"content": 1}}]):
+            df.update(set(_bigrams(d.get("content") or "")))
+            n += 1
+        self._df, self._n_docs = df, n
+        logger.info(f"라우터 어휘 구축: 문서 {n}개, bigram {len(df)}개")
+
+    def _build_loop(self) -> None:
+        delay = self.retry_sec
+        while True:
+            try:
+                self.build_vocab()
+                return
+            except Exception as e:
+                # 구축 전까지는 규칙 기반 라우팅만 동작 (커버리지 판단은 생략)
+                logger.warning(f"라우터 어휘 구축 실패, {delay:.0f}초 후 재시도: {e}")
+                time.sleep(delay)
+                delay = min(delay * 2, 600)
+
+    def coverage(self, question: str) -> Optional[float]:
+        """질문 bigram 중 코퍼스에 등장하는 비율 (IDF 가중). 어휘가 없으면 None"""
+        df, n_docs = self._df, self._n_docs
+        grams = _bigrams(question)
+        if not n_docs:
+            return None
+        if not grams:
+            return 0.0  # 의문사/어미만 있는 입력 ("뭐야?")
+        total = hit = 0.0
+        for g in grams:
+            c = df.get(g, 0)
+            # 미등장 bigram은 흔한 bigram과 같은 최소 가중치 — 구어체 표현이 핵심어를 압도하지 않도록
+            w = math.log((n_docs + 1) / (c + 1)) + 1.0 if c else 1.0
+            total += w
+            if c: hit += w
+        return hit / total
+
+    # ---------- 라우팅 (요청마다) ----------
+    def _decide(self, question: str) -> Dict:
+        text = (question or "").strip()
+        compact = "".join(_TOKEN_RE.findall(text))
+        if len(compact) < 2:
+            return {"route": ROUTE_CANNED, "reason": "empty", "coverage": None}
+        if _TEST_RE.match(text):
+            return {"route": ROUTE_CANNED, "reason": "test", "coverage": None}
+        if _GREETING_RE.match(text):
+            return {"route": ROUTE_CANNED, "reason": "greeting", "coverage": None}
+
+        cov = self.coverage(text)
+        if cov is None:
+            return {"route": ROUTE_ANSWER, "reason": "no_vocab", "coverage": None}
+        if cov < self.min_coverage:
+            return {"route": ROUTE_CANNED, "reason": "off_domain", "coverage": cov}
+        if cov >= self.cheap_coverage and len(_terms(text)) <= self.cheap_max_terms:
+            return {"route": ROUTE_CHEAP, "reason": "keyword", "coverage": cov}
+        return {"route": ROUTE_ANSWER, "reason": "in_domain", "coverage": cov}
+
+    def route(self, question: str) -> Dict:
+        if not self.enabled:
+            return {"route": ROUTE_ANSWER, "reason": "disabled", "coverage": None}
+        decision = self._decide(question)
+        # 임계값 튜닝용 구조화 로그 (한 줄 JSON)
+        logger.info("route_decision " + json.dumps({
+            **decision,
+            "coverage": None if decision["coverage"] is None else round(decision["coverage"], 4),
+            "question": question,
+        }, ensure_ascii=False))
+        return decision
+
+    @staticmethod
+    def canned_message(reason: str) -> str:
+        return CANNED_MESSAGES[reason]
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+캡처된 /qna 트래픽을 서버에 재생하는 부하 테스트 스크립트
+
+사용 예:
+    # 목표 QPS 프로파일 (5 QPS로 30초 → 10 QPS로 60초)
+    python replay.py 'captures/qna_capture.*.jsonl.gz' --mode qps --profile 5x30,10x60
+
+    # 동시성 프로파일 (동시 4개로 60초)
+    python replay.py 'captures/qna_capture.*.jsonl.gz' --mode concurrency --profile 4x60
+
+실제 백엔드 대신 캡처된 업스트림 응답으로 결정적으로 재생하려면 서버를
+QNA_PLAYBACK_PATH=<캡처 파일> 로 띄운 뒤 같은 파일을 --playback 으로 재생한다
+(재현할 수 없는 오류/단계 없는 레코드는 제외). 캡처 파일은 워커 프로세스별로
+나뉘므로 'captures/qna_capture.*.jsonl.gz' 처럼 glob 패턴을 따옴표로 넘기면 된다.
+
+qps 모드의 지연시간은 예정 발사 시각부터 측정하므로, 서버가 밀려 요청이
+클라이언트 쪽에서 대기한 시간도 포함된다 (coordinated omission 방지).
+"""
+
+import argparse
+import itertools
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from latency_stats import percentile
+from traffic_capture import iter_records, is_replayable
+
+# 지연시간 히스토그램 버킷 상한 (ms)
+HISTOGRAM_BUCKETS_MS = [50, 100, 250, 500, 1000, 2000, 3000, 5000, 8000, 13000, 20000, 30000]
+
+
+def parse_profile(profile: str) -> List[Tuple[float, float]]:
+    """'5x30,10x60' → [(5.0, 30.0), (10.0, 60.0)] (수준 x 지속시간(초)). 형식이 틀리면 ValueError"""
+    steps = []
+    for part in profile.split(","):
+        try:
+            level, duration = (float(x) for x in part.strip().lower().split("x"))
+        except ValueError:
+            raise ValueError(f"프로파일 형식 오류: {part.strip()!r} (예: 5x30)")
+        if level <= 0 or duration <= 0:
+            raise ValueError(f"수준과 지속시간은 0보다 커야 합니다: {part.strip()!r}")
+        steps.append((level, duration))
+    return steps
+
+
+class ReplayStats:
+    """요청 결과(지연시간/상태)를 스레드 안전하게 모음"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies_ms: List[float] = []
+        self.statuses: Counter = Counter()
+        self.judge_success = 0
+        self.late = 0  # 예정 시각보다 늦게 발사된 요청 수 (qps 모드)
+
+    def add(self, latency_ms: float, status: str, judged_success: bool = False, late: bool = False):
+        with self._lock:
+            if late:
+                self.late += 1
+            self.latencies_ms.append(latency_ms)
+            self.statuses[status] += 1
+            if judged_success:
+                self.judge_success += 1
+
+    def histogram(self) -> Dict[str, int]:
+        buckets = {f"<= {b}ms": 0 for b in HISTOGRAM_BUCKETS_MS}
+        buckets[f"> {HISTOGRAM_BUCKETS_MS[-1]}ms"] = 0
+        for v in self.latencies_ms:
+            for b in HISTOGRAM_BUCKETS_MS:
+                if v <= b:
+                    buckets[f"<= {b}ms"] += 1
+                    break
+            else:
+                buckets[f"> {HISTOGRAM_BUCKETS_MS[-1]}ms"] += 1
+        return buckets
+
+
+def send_one(base_url: str, question: str, timeout: float, stats: ReplayStats,
+             scheduled: Optional[float] = None, late_ms: float = 10.0):
+    # 지연시간은 예정 발사 시각 기준 (풀 대기열에서 기다린 시간 포함)
+    start = time.perf_counter()
+    origin = scheduled if scheduled is not None else start
+    late = (start - origin) * 1000 > late_ms
+    try:
+        response = requests.post(f"{base_url}/qna", json={"input_message": question}, timeout=timeout)
+        latency_ms = (time.perf_counter() - origin) * 1000
+        judged = response.status_code == 200 and bool(response.json().get("success"))
+        stats.add(latency_ms, str(response.status_code), judged, late)
+    except requests.exceptions.RequestException as e:
+        stats.add((time.perf_counter() - origin) * 1000, type(e).__name__, late=late)
+
+
+def run_qps(base_url: str, questions, steps, timeout: float, stats: ReplayStats, max_workers: int,
+            late_ms: float = 10.0):
+    """오픈 루프: 응답을 기다리지 않고 목표 QPS 간격으로 요청을 발사"""
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for qps, duration in steps:
+            print(f"▶ {qps:g} QPS x {duration:g}s")
+            interval = 1.0 / qps
+            start = time.perf_counter()
+            sent = 0
+            while time.perf_counter() - start < duration:
+                scheduled = start + sent * interval
+                pool.submit(send_one, base_url, next(questions), timeout, stats, scheduled, late_ms)
+                sent += 1
+                delay = start + sent * interval - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+
+def run_concurrency(base_url: str, questions, steps, timeout: float, stats: ReplayStats):
+    """클로즈드 루프: N개의 워커가 응답을 받는 즉시 다음 요청을 보냄"""
+    lock = threading.Lock()
+
+    def worker(deadline: float):
+        while time.perf_counter() < deadline:
+            with lock:
+                question = next(questions)
+            send_one(base_url, question, timeout, stats)
+
+    for concurrency, duration in steps:
+        print(f"▶ concurrency {int(concurrency)} x {duration:g}s")
+        deadline = time.perf_counter() + duration
+        threads = [threading.Thread(target=worker, args=(deadline,)) for _ in range(int(concurrency))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+
+def print_summary(stats: ReplayStats, elapsed: float):
+    total = len(stats.latencies_ms)
+    errors = sum(n for status, n in stats.statuses.items() if status != "200")
+
+    print("\n" + "=" * 50)
+    print("📊 Replay Summary:")
+    print(f"Requests: {total}  Elapsed: {elapsed:.1f}s  Throughput: {total / elapsed if elapsed else 0:.2f} req/s")
+    print(f"Errors: {errors} ({(errors / total * 100) if total else 0:.1f}%)  "
+          f"Judge success: {stats.judge_success}  "
+          f"Missed schedule: {stats.late} ({(stats.late / total * 100) if total else 0:.1f}%)")
+    print("Status: " + ", ".join(f"{s}={n}" for s, n in sorted(stats.statuses.items())))
+    print("Latency (ms): " + "  ".join(
+        f"p{p}={percentile(stats.latencies_ms, p):.0f}" for p in (50, 90, 95, 99)
+    ) + f"  max={max(stats.latencies_ms, default=0):.0f}")
+
+    print("\nLatency histogram:")
+    hist = stats.histogram()
+    peak = max(hist.values(), default=0) or 1
+    for bucket, count in hist.items():
+        print(f"{bucket:>10} | {'#' * int(40 * count / peak):<40} {count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="캡처된 /qna 트래픽 재생 부하 테스트")
+    parser.add_argument("capture", help="캡처 파일 또는 glob 패턴 (.jsonl / .jsonl.gz)")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--mode", choices=["qps", "concurrency"], default="qps")
+    parser.add_argument("--profile", default="1x60", help="수준x초 목록, 예: 5x30,10x60")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--max-workers", type=int, default=64, help="qps 모드의 최대 동시 요청 수")
+    parser.add_argument("--late-ms", type=float, default=10.0, help="예정 시각 대비 이 이상 늦으면 missed로 집계")
+    parser.add_argument("--playback", action="store_true",
+                        help="서버가 QNA_PLAYBACK_PATH 재생 모드일 때: 재현 불가능한 레코드 제외")
+    args = parser.parse_args()
+    try:
+        steps = parse_profile(args.profile)
+    except ValueError as e:
+        parser.error(str(e))
+
+    captured = [rec["question"] for rec in iter_records(args.capture)
+                if rec.get("question") and (not args.playback or is_replayable(rec))]
+    if not captured:
+        print(f"❌ No questions found in {args.capture}")
+        return
+    print(f"🚀 Replaying {len(captured)} captured questions against {args.base_url}")
+
+    questions = itertools.cycle(captured)
+    stats = ReplayStats()
+
+    start = time.perf_counter()
+    if args.mode == "qps":
+        run_qps(args.base_url, questions, steps, args.timeout, stats, args.max_workers, args.late_ms)
+    else:
+        run_concurrency(args.base_url, questions, steps, args.timeout, stats)
+    print_summary(stats, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import re
+from types import SimpleNamespace
+
+import pytest
+
+from answer_store import AnswerStore
+
+
+def _matches(doc, query):
+    for key, cond in query.items():
+        val = doc.get(key)
+        if isinstance(cond, dict) and "$ne" in cond:
+            if val == cond["$ne"]: return False
+        elif isinstance(cond, dict) and "$regex" in cond:
+            if not isinstance(val, str) or not re.search(cond["$regex"], val): return False
+        elif isinstance(cond, dict) and "$elemMatch" in cond:
+            if not any(_matches(e, cond["$elemMatch"]) for e in val or []): return False
+        elif val != cond:
+            return False
+    return True
+
+
+class Cursor(list):
+    def sort(self, key, direction):
+        return Cursor(sorted(self, key=lambda d: d[key], reverse=direction < 0))
+
+
+class FakeCollection:
+    """answer_store가 쓰는 pymongo 연산만 흉내 내는 인메모리 컬렉션"""
+
+    def __init__(self, docs=()):
+        self.docs = [dict(d) for d in docs]
+        self.find_calls = 0
+
+    def find(self, query, projection=None):
+        self.find_calls += 1
+        return Cursor(dict(d) for d in self.docs if _matches(d, query))
+
+    def update_many(self, query, update):
+        hits = [d for d in self.docs if _matches(d, query)]
+        for d in hits:
+            d.update(update["$set"])
+        return SimpleNamespace(matched_count=len(hits))
+
+    def replace_one(self, query, doc, upsert=False):
+        self.docs = [d for d in self.docs if not _matches(d, query)] + [dict(doc)]
+
+    def delete_one(self, query):
+        self.docs = [d for d in self.docs if not _matches(d, query)]
+
+
+CHUNKS = [
+    {"_id": 1, "source": "/data/pdfs/자동차보험_특별약관.pdf", "page_number": 12, "content": "가족 한정운전 특별약관"},
+    {"_id": 2, "source": "/data/pdfs/자동차보험_특별약관.pdf", "page_number": 12, "content": "형제자매 포함"},
+    {"_id": 3, "source": "C:\\pdfs\\자동차보험_기본약관.pdf", "page_number": 23, "content": "대물배상 한도"},
+    {"_id": 4, "source": "구_자동차보험_기본약관.pdf", "page_number": 23, "content": "구 약관"},
+]
+
+
+def _response(question):
+    return {"success": True, "messages": [{"HumanMessage": question}, {"AIMessage": "답변"}], "citations": []}
+
+
+@pytest.fixture
+def chunks():
+    return FakeCollection(CHUNKS)
+
+
+@pytest.fixture
+def store(chunks):
+    rag_app = SimpleNamespace(playback=None, DB_NAME="insurance", col=chunks,
+                              mongo={"insurance": {"precomputed_answers": FakeCollection()}})
+    s = AnswerStore(rag_app, background=False)
+    s.put("가족 한정운전 특약 알려줘", _response("가족 한정운전 특약 알려줘"), [CHUNKS[0], CHUNKS[1]])
+    s.put("대물배상 한도?", _response("대물배상 한도?"), [CHUNKS[2]])
+    s.put("구 약관 대물배상", _response("구 약관 대물배상"), [CHUNKS[3]])
+    return s
+
+
+def test_normalize_question():
+    assert AnswerStore.normalize_question("  대물배상   한도?? ") == "대물배상 한도"
+    assert AnswerStore.normalize_question("Hello World!") == "hello world"
+
+
+def test_source_keys_dedupes_in_order():
+    keys = AnswerStore.source_keys(CHUNKS[:3])
+    assert keys == [("/data/pdfs/자동차보험_특별약관.pdf", 12), ("C:\\pdfs\\자동차보험_기본약관.pdf", 23)]
+
+
+def test_lookup_reads_snapshot_only(store):
+    assert store.lookup("대물배상 한도") is None  # reload 전에는 빈 스냅샷
+    store.reload()
+    calls = store.col.find_calls
+    hit = store.lookup("대물배상  한도!")
+    assert hit["messages"][0] == {"HumanMessage": "대물배상  한도!"}
+    assert hit["messages"][1] == {"AIMessage": "답변"}
+    assert store.col.find_calls == calls
+
+
+@pytest.mark.parametrize("source", [
+    "자동차보험_기본약관.pdf",
+    "C:\\pdfs\\자동차보험_기본약관.pdf",
+    "/another/mount/자동차보험_기본약관.pdf",
+])
+def test_invalidate_matches_basename_or_path(store, source):
+    assert store.invalidate_sources([(source, 23)]) == 1
+    assert store.stale_questions() == ["대물배상 한도?"]
+
+
+def test_invalidate_does_not_match_name_suffix(store):
+    # "구_자동차보험_기본약관.pdf"는 같은 이름으로 끝나지만 다른 파일
+    store.invalidate_sources([("자동차보험_기본약관.pdf", None)])
+    assert "구 약관 대물배상" not in store.stale_questions()
+
+
+def test_invalidate_respects_page_number(store):
+    assert store.invalidate_sources([("자동차보험_특별약관.pdf", 13)]) == 0
+    assert store.invalidate_sources([("자동차보험_특별약관.pdf", None)]) == 1
+
+
+def test_invalidated_entries_are_hidden_from_lookup(store):
+    store.invalidate_sources([("자동차보험_기본약관.pdf", 23)])
+    store.reload()
+    assert store.lookup("대물배상 한도") is None
+    assert store.lookup("가족 한정운전 특약 알려줘") is not None
+
+
+def test_stale_questions_detects_changed_content(store, chunks):
+    assert store.stale_questions() == []
+    chunks.docs[1]["content"] = "형제자매 제외"
+    assert store.stale_questions() == ["가족 한정운전 특약 알려줘"]
+
+
+def test_stale_questions_detects_removed_chunk(store, chunks):
+    chunks.docs = [d for d in chunks.docs if d["_id"] != 3]
+    assert store.stale_questions() == ["대물배상 한도?"]
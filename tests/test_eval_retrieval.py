@@ -0,0 +1,127 @@
+import json
+import math
+
+import pytest
+
+from eval_retrieval import QueryEmbeddingCache, SnapshotRAGApp, evaluate, mark_pareto
+
+GOLDEN = [
+    {"question": "q1", "expected": [{"source": "특별약관.pdf", "page_number": 12}]},
+    {"question": "q2", "expected": [{"source": "기본약관.pdf", "page_number": 3},
+                                    {"source": "기본약관.pdf", "page_number": 4}]},
+    {"question": "q3", "expected": [{"source": "기본약관.pdf", "page_number": 9}]},
+]
+
+# 질문별 고정 순위 (source는 저장된 전체 경로, page_number는 문자열로 저장된 경우도 섞음)
+RANKINGS = {
+    "q1": [{"source": "/data/pdfs/특별약관.pdf", "page_number": 1},
+           {"source": "/data/pdfs/특별약관.pdf", "page_number": "12"}],
+    "q2": [{"source": "/data/pdfs/기본약관.pdf", "page_number": 3},
+           {"source": "/data/pdfs/다른약관.pdf", "page_number": 4}],
+    "q3": [{"source": "/data/pdfs/기본약관.pdf", "page_number": 8}],
+}
+
+
+class FakeRAGApp:
+    def __init__(self):
+        self.calls = []
+
+    def hybrid_search(self, question, k, num_candidates, rrf_k):
+        self.calls.append((question, k, num_candidates, rrf_k))
+        return RANKINGS[question][:k]
+
+
+def test_evaluate_recall_and_mrr():
+    app = FakeRAGApp()
+    r = evaluate(app, GOLDEN, k=5, num_candidates=400, rrf_k=60)
+    # q1: 2위에서 적중(recall 1, rr 1/2), q2: 2개 중 1개 (recall 1/2, rr 1), q3: 없음
+    assert r["recall"] == pytest.approx((1 + 0.5 + 0) / 3)
+    assert r["mrr"] == pytest.approx((0.5 + 1 + 0) / 3)
+    assert (r["k"], r["num_candidates"], r["rrf_k"]) == (5, 400, 60)
+    assert app.calls[0] == ("q1", 5, 400, 60)
+
+
+def test_evaluate_respects_k():
+    r = evaluate(FakeRAGApp(), GOLDEN, k=1, num_candidates=400, rrf_k=60)
+    assert r["recall"] == pytest.approx(0.5 / 3)
+    assert r["mrr"] == pytest.approx(1 / 3)
+
+
+def _result(recall, p50):
+    return {"recall": recall, "p50_ms": p50}
+
+
+def test_mark_pareto():
+    results = [_result(0.9, 50), _result(0.8, 30), _result(0.8, 40), _result(0.95, 80), _result(0.9, 50)]
+    mark_pareto(results)
+    # (0.8, 40)은 (0.8, 30)에 지배됨; 동일한 두 구성은 서로 지배하지 않음
+    assert [r["pareto"] for r in results] == [True, True, False, True, True]
+
+
+class FakeEmbeddings:
+    def __init__(self, vec):
+        self.vec = vec
+        self.calls = 0
+
+    def embed_query(self, query):
+        self.calls += 1
+        return self.vec
+
+
+def test_embedding_cache_is_keyed_by_model(tmp_path):
+    path = str(tmp_path / "query_embeddings.json")
+    full = FakeEmbeddings([1.0, 0.0, 0.0, 0.0])
+    cache = QueryEmbeddingCache(lambda: full, path, model_key="text-embedding-3-small:default")
+    cache.embed_query("q1"); cache.embed_query("q1")
+    cache.save()
+    assert full.calls == 1 and len(cache.latencies_ms) == 1
+
+    again = QueryEmbeddingCache(lambda: pytest.fail("캐시 적중이어야 함"), path,
+                                model_key="text-embedding-3-small:default")
+    assert again.embed_query("q1") == [1.0, 0.0, 0.0, 0.0]
+
+    short = FakeEmbeddings([1.0, 0.0])
+    other = QueryEmbeddingCache(lambda: short, path, model_key="text-embedding-3-small:2")
+    assert other.embed_query("q1") == [1.0, 0.0]
+    assert short.calls == 1
+
+
+def _unit(v):
+    n = math.sqrt(sum(x * x for x in v))
+    return [x / n for x in v]
+
+
+@pytest.fixture
+def snapshot(tmp_path, monkeypatch):
+    monkeypatch.setenv("MONGO_EMBEDDING_PATH", "embedding_short")
+    monkeypatch.delenv("AZURE_OPENAI_EMB_DIMENSIONS", raising=False)
+    path = tmp_path / "documents.jsonl"
+    docs = [
+        {"_id": "a", "content": "대물배상 한도", "source": "기본약관.pdf", "page_number": 1,
+         "embedding_short": _unit([1.0, 0.0])},
+        {"_id": "b", "content": "가족 한정운전", "source": "특별약관.pdf", "page_number": 2,
+         "embedding_short": _unit([0.0, 1.0])},
+        {"_id": "c", "content": "임베딩 없는 청크", "source": "특별약관.pdf", "page_number": 3},
+    ]
+    path.write_text("\n".join(json.dumps(d, ensure_ascii=False) for d in docs), encoding="utf-8")
+    return SnapshotRAGApp(str(path), str(tmp_path / "query_embeddings.json"))
+
+
+def test_snapshot_shortens_longer_query_vector(snapshot):
+    # 전체 차원 질의 벡터를 축소 차원 스냅샷에 맞춰 잘라 정규화
+    snapshot.emb = QueryEmbeddingCache(lambda: FakeEmbeddings(_unit([0.2, 0.9, 0.3, 0.3])))
+    docs = snapshot._atlas_vector_search("가족", k=5)
+    assert [d["_id"] for d in docs] == ["b", "a"]
+    assert docs[0]["_semScore"] == pytest.approx(0.9 / math.sqrt(0.2 ** 2 + 0.9 ** 2))
+
+
+def test_snapshot_rejects_shorter_query_vector(snapshot, tmp_path):
+    snapshot.emb = QueryEmbeddingCache(lambda: FakeEmbeddings([1.0]))
+    with pytest.raises(ValueError):
+        snapshot._atlas_vector_search("가족", k=5)
+
+
+def test_snapshot_hybrid_search_finds_lexical_match(snapshot):
+    snapshot.emb = QueryEmbeddingCache(lambda: FakeEmbeddings(_unit([1.0, 0.0])))
+    docs = snapshot.hybrid_search("대물배상 한도", k=2)
+    assert docs[0]["_id"] == "a"
@@ -0,0 +1,35 @@
+import json
+
+import pytest
+
+from precompute_answers import load_curated, parse_source_spec, top_questions_from_capture
+
+
+@pytest.mark.parametrize("spec, expected", [
+    ("자동차보험_기본약관.pdf:23", ("자동차보험_기본약관.pdf", 23)),
+    ("자동차보험_기본약관.pdf", ("자동차보험_기본약관.pdf", None)),
+    ("/data/pdfs/자동차보험_기본약관.pdf:7", ("/data/pdfs/자동차보험_기본약관.pdf", 7)),
+    ("C:\\pdfs\\자동차보험_기본약관.pdf", ("C:\\pdfs\\자동차보험_기본약관.pdf", None)),
+    ("C:\\pdfs\\자동차보험_기본약관.pdf:3", ("C:\\pdfs\\자동차보험_기본약관.pdf", 3)),
+    ("약관.pdf:p3", ("약관.pdf:p3", None)),
+])
+def test_parse_source_spec(spec, expected):
+    assert parse_source_spec(spec) == expected
+
+
+def test_top_questions_groups_normalized_variants(tmp_path):
+    questions = (["대물배상 한도?"] * 2 + ["대물배상  한도"] + ["대물배상 한도"] * 3
+                 + ["가족 한정운전 특약"] * 4 + ["긴급출동 서비스"] + [""])
+    path = tmp_path / "capture.jsonl"
+    path.write_text("\n".join(json.dumps({"question": q}, ensure_ascii=False) for q in questions),
+                    encoding="utf-8")
+
+    # 정규화 키 기준 6회 > 4회 > 1회, 대표 문구는 가장 많이 쓰인 원문
+    assert top_questions_from_capture(str(path), 2) == ["대물배상 한도", "가족 한정운전 특약"]
+    assert top_questions_from_capture(str(path), 10)[-1] == "긴급출동 서비스"
+
+
+def test_load_curated_skips_comments_and_blanks(tmp_path):
+    path = tmp_path / "curated.txt"
+    path.write_text("# 핵심 특약\n대물배상 한도\n\n  가족 한정운전 특약  \n", encoding="utf-8")
+    assert load_curated(str(path)) == ["대물배상 한도", "가족 한정운전 특약"]
@@ -0,0 +1,125 @@
+import pytest
+
+from query_router import QueryRouter, ROUTE_ANSWER, ROUTE_CANNED, ROUTE_CHEAP
+
+# 약관 문체의 합성 코퍼스
+CLAUSES = [
+    "가족과 형제자매 한정운전 특별약관은 기명피보험자의 가족 및 형제자매가 운전하는 경우에 한하여 보상합니다.",
+    "대물배상은 피보험자동차의 사고로 다른 사람의 재물을 없애거나 훼손한 경우 보험가입금액 한도로 보상합니다.",
+    "자기차량손해 보험금은 보험가입금액을 한도로 지급하며 자기부담금을 공제합니다.",
+    "대인배상 책임보험의 보상 한도와 면책 사항은 다음과 같습니다.",
+    "하이브리드 자동차 및 전기자동차는 친환경 차량 할인 특별약관에 따라 보험료를 할인합니다.",
+    "하이패스 단말기 등 차량에 부착된 부속품의 도난 손해는 보상하지 않습니다.",
+    "시험 주행 또는 테스트 주행 중 발생한 사고는 보상하지 않는 손해에 해당합니다.",
+    "긴급출동 서비스 특별약관은 배터리 충전, 타이어 교체, 비상 급유를 제공합니다.",
+]
+
+
+class FakeCollection:
+    def aggregate(self, pipeline):
+        return iter([{"content": c} for c in CLAUSES])
+
+
+@pytest.fixture
+def router():
+    r = QueryRouter(FakeCollection(), enabled=True, background=False)
+    r.build_vocab()
+    return r
+
+
+@pytest.mark.parametrize("question, reason", [
+    ("", "empty"),
+    ("   ?? ", "empty"),
+    ("테스트 질문입니다.", "test"),
+    ("테스트", "test"),
+    ("test", "test"),
+    ("test question", "test"),
+    ("Test message.", "test"),
+    ("안녕하세요", "greeting"),
+    ("안녕하세요!", "greeting"),
+    ("안녕하세요?", "greeting"),
+    ("hi", "greeting"),
+    ("hi?", "greeting"),
+    ("hi there", "greeting"),
+    ("Hello~", "greeting"),
+    ("감사합니다", "greeting"),
+])
+def test_rule_canned(router, question, reason):
+    decision = router.route(question)
+    assert decision["route"] == ROUTE_CANNED
+    assert decision["reason"] == reason
+
+
+@pytest.mark.parametrize("question", [
+    "하이브리드 차량 보험료 할인",
+    "하이패스 단말기 도난 보상",
+    "테스트 주행 중 사고 보상",
+    "안녕하세요 대물배상 한도 알려주세요",
+    "highway 사고 보상",
+])
+def test_rule_does_not_catch_domain_questions(router, question):
+    decision = router.route(question)
+    assert decision["reason"] not in ("test", "greeting")
+    assert decision["route"] != ROUTE_CANNED
+
+
+@pytest.mark.parametrize("question", [
+    "가족과 형제·자매 한정운전 특별약관 알려줘",
+    "하이브리드 차량 보험료 할인",
+    "하이패스 단말기 도난 보상",
+])
+def test_in_domain_takes_hybrid_path(router, question):
+    assert router.route(question)["route"] == ROUTE_ANSWER
+
+
+@pytest.mark.parametrize("question", [
+    # 약관과 표현이 달라 커버리지가 낮은 도메인 질문 → 의미 검색이 필요하므로 하이브리드
+    "렌터카 빌렸는데 사고나면 보상돼?",
+    "자차 보험 가입했는데 침수 피해도 되나요",
+])
+def test_low_coverage_takes_hybrid_path(router, question):
+    decision = router.route(question)
+    assert decision["coverage"] < 0.5
+    assert decision["route"] == ROUTE_ANSWER
+
+
+@pytest.mark.parametrize("question", [
+    "대물배상 한도",
+    "대물배상 한도 얼마야?",
+    "자기차량손해 보험금은 어떻게 계산해?",
+])
+def test_short_keyword_question_takes_cheap_path(router, question):
+    assert router.route(question)["route"] == ROUTE_CHEAP
+
+
+@pytest.mark.parametrize("question", [
+    "오늘 서울 날씨 어때",
+    "주식 투자 추천해줘",
+    "뭐야?",
+])
+def test_off_domain_cutoff_is_off_by_default(router, question):
+    assert router.route(question)["route"] == ROUTE_ANSWER
+
+
+@pytest.mark.parametrize("question", [
+    "오늘 서울 날씨 어때",
+    "주식 투자 추천해줘",
+    "뭐야?",
+])
+def test_off_domain_when_cutoff_enabled(monkeypatch, question):
+    monkeypatch.setenv("ROUTER_MIN_COVERAGE", "0.15")
+    r = QueryRouter(FakeCollection(), enabled=True, background=False)
+    r.build_vocab()
+    decision = r.route(question)
+    assert decision["route"] == ROUTE_CANNED
+    assert decision["reason"] == "off_domain"
+
+
+def test_no_vocab_falls_back_to_answer():
+    r = QueryRouter(None, enabled=True)
+    assert r.route("대물배상 한도 얼마야?") == {"route": ROUTE_ANSWER, "reason": "no_vocab", "coverage": None}
+
+
+def test_disabled_router_always_answers():
+    r = QueryRouter(FakeCollection(), enabled=False, background=False)
+    assert r.route("테스트 질문입니다.")["route"] == ROUTE_ANSWER
@@ -0,0 +1,47 @@
+import pytest
+
+from latency_stats import percentile
+from replay import HISTOGRAM_BUCKETS_MS, ReplayStats, parse_profile
+
+
+def test_parse_profile():
+    assert parse_profile("5x30,10x60") == [(5.0, 30.0), (10.0, 60.0)]
+    assert parse_profile(" 0.5X120 ") == [(0.5, 120.0)]
+
+
+@pytest.mark.parametrize("profile", ["5x", "x30", "5", "5x30x2", "abc", "5x30,", "0x30", "5x0", "-1x30"])
+def test_parse_profile_rejects_bad_input(profile):
+    with pytest.raises(ValueError):
+        parse_profile(profile)
+
+
+def test_percentile():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 95) == 95.0
+    assert percentile(values, 100) == 100.0
+    assert percentile([7.0], 99) == 7.0
+    assert percentile([], 50) == 0.0
+
+
+def test_histogram_bucketing():
+    stats = ReplayStats()
+    for v in [10, 50, 50.1, 100, 999, HISTOGRAM_BUCKETS_MS[-1], HISTOGRAM_BUCKETS_MS[-1] + 1]:
+        stats.add(v, "200")
+    hist = stats.histogram()
+    assert hist["<= 50ms"] == 2          # 경계값은 해당 버킷에 포함
+    assert hist["<= 100ms"] == 2
+    assert hist["<= 1000ms"] == 1
+    assert hist[f"<= {HISTOGRAM_BUCKETS_MS[-1]}ms"] == 1
+    assert hist[f"> {HISTOGRAM_BUCKETS_MS[-1]}ms"] == 1
+    assert sum(hist.values()) == 7
+
+
+def test_stats_counts_late_and_judged():
+    stats = ReplayStats()
+    stats.add(120.0, "200", judged_success=True)
+    stats.add(300.0, "200", late=True)
+    stats.add(60000.0, "ReadTimeout", late=True)
+    assert stats.late == 2
+    assert stats.judge_success == 1
+    assert stats.statuses == {"200": 2, "ReadTimeout": 1}
@@ -0,0 +1,86 @@
+import gzip
+import json
+import os
+import shutil
+
+import pytest
+
+from traffic_capture import (TrafficRecorder, UpstreamPlayback, _per_process_path, is_replayable,
+                             iter_records, record_stage)
+
+
+@pytest.mark.parametrize("path, expected", [
+    (os.path.join("captures", "qna_capture.jsonl.gz"), os.path.join("captures", "qna_capture.123.jsonl.gz")),
+    (os.path.join("captures", "qna_capture.jsonl"), os.path.join("captures", "qna_capture.123.jsonl")),
+    ("qna_capture", "qna_capture.123"),
+])
+def test_per_process_path(path, expected):
+    assert _per_process_path(path, 123) == expected
+
+
+def test_iter_records_reads_truncated_gzip_stream(tmp_path):
+    # 아직 닫히지 않은(기록 중인) 스트림: flush된 레코드까지는 읽혀야 함
+    live = tmp_path / "live.jsonl.gz"
+    f = gzip.open(live, "wt", encoding="utf-8")
+    for i in range(3):
+        f.write(json.dumps({"question": f"q{i}"}) + "\n")
+    f.flush()
+    snapshot = tmp_path / "snapshot.jsonl.gz"
+    shutil.copy(live, snapshot)
+    f.close()
+
+    assert [r["question"] for r in iter_records(str(snapshot))] == ["q0", "q1", "q2"]
+
+
+def test_iter_records_stops_at_partial_line(tmp_path):
+    path = tmp_path / "capture.jsonl"
+    path.write_text('{"question": "q0"}\n{"question": "q1"}\n{"questi', encoding="utf-8")
+    assert [r["question"] for r in iter_records(str(path))] == ["q0", "q1"]
+
+
+def test_iter_records_glob(tmp_path):
+    for pid in (1, 2):
+        with gzip.open(tmp_path / f"qna_capture.{pid}.jsonl.gz", "wt", encoding="utf-8") as f:
+            f.write(json.dumps({"question": f"q{pid}"}) + "\n")
+    assert [r["question"] for r in iter_records(str(tmp_path / "qna_capture.*.jsonl.gz"))] == ["q1", "q2"]
+
+
+def test_recorder_writes_stages_to_per_process_file(tmp_path):
+    path = str(tmp_path / "qna_capture.jsonl.gz")
+    recorder = TrafficRecorder(path=path, sample_rate=1.0, enabled=True)
+    with recorder.capture("대물배상 한도") as rec:
+        record_stage("text_search", [{"content": "대물배상"}])
+        rec["response"] = {"success": True}
+    with pytest.raises(RuntimeError):
+        with recorder.capture("오류 질문"):
+            raise RuntimeError("boom")
+    record_stage("text_search", "캡처 밖에서는 무시")
+    recorder.close()
+
+    records = list(iter_records(_per_process_path(path, os.getpid())))
+    assert [r["status"] for r in records] == ["ok", "error"]
+    assert records[0]["stages"] == {"text_search": [{"content": "대물배상"}]}
+    assert is_replayable(records[0])
+    assert not is_replayable(records[1])
+
+
+def test_recorder_disabled_yields_none(tmp_path):
+    recorder = TrafficRecorder(path=str(tmp_path / "c.jsonl.gz"), sample_rate=1.0, enabled=False)
+    with recorder.capture("q") as rec:
+        assert rec is None
+    assert not list(tmp_path.iterdir())
+
+
+def test_playback_skips_unreplayable_records(tmp_path):
+    path = tmp_path / "capture.jsonl"
+    path.write_text("\n".join(json.dumps(r, ensure_ascii=False) for r in [
+        {"question": "q1", "status": "ok", "stages": {"answer_llm": "답변"}},
+        {"question": "q2", "status": "error", "stages": {"answer_llm": "부분"}},
+        {"question": "q3", "status": "ok", "stages": {}},
+    ]), encoding="utf-8")
+    playback = UpstreamPlayback(str(path))
+    assert playback.lookup("q1", "answer_llm") == "답변"
+    assert playback.get("q1", "precomputed") is None
+    for q in ("q2", "q3"):
+        with pytest.raises(KeyError):
+            playback.lookup(q, "answer_llm")
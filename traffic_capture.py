@@ -0,0 +1,158 @@
+# traffic_capture.py
+import os, glob, json, gzip, time, atexit, random, logging, threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# 요청 단위로 업스트림(Atlas/LLM) 응답을 모으는 버킷 (샘플링되지 않은 요청은 None)
+_stages: ContextVar[Optional[Dict[str, Any]]] = ContextVar("qna_capture_stages", default=None)
+
+
+def record_stage(stage: str, value: Any) -> None:
+    """현재 캡처 중인 요청에 단계별 업스트림 응답을 기록 (캡처 중이 아니면 무시)"""
+    bucket = _stages.get()
+    if bucket is not None:
+        bucket[stage] = value
+
+
+def _open(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def iter_records(path: str) -> Iterator[Dict]:
+    """
+    캡처 파일(.jsonl / .jsonl.gz)의 레코드를 순서대로 읽음.
+    path에 glob 패턴(예: captures/qna_capture.*.jsonl.gz)을 주면 일치하는 파일을 모두 읽는다.
+    """
+    paths = sorted(glob.glob(path)) if glob.has_magic(path) else [path]
+    for p in paths:
+        with _open(p, "r") as f:
+            try:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        yield json.loads(line)
+            except (EOFError, json.JSONDecodeError) as e:
+                # 기록 중인(아직 닫히지 않은) gzip 스트림은 마지막 flush 지점까지만 읽힘
+                logger.warning(f"{p}: 끝부분이 잘린 캡처 파일 ({e})")
+
+
+def _per_process_path(path: str, pid: int) -> str:
+    """captures/qna_capture.jsonl.gz → captures/qna_capture.<pid>.jsonl.gz"""
+    head, name = os.path.split(path)
+    stem, dot, ext = name.partition(".")
+    return os.path.join(head, f"{stem}.{pid}.{ext}" if dot else f"{name}.{pid}")
+
+
+class TrafficRecorder:
+    """샘플링된 /qna 요청과 단계별 업스트림 응답을 JSONL(gzip)로 기록"""
+
+    def __init__(self, path: Optional[str] = None, sample_rate: Optional[float] = None,
+                 enabled: Optional[bool] = None):
+        self.enabled = enabled if enabled is not None else \
+            os.getenv("QNA_CAPTURE_ENABLED", "false").lower() == "true"
+        self.path = path or os.getenv("QNA_CAPTURE_PATH", "captures/qna_capture.jsonl.gz")
+        self.sample_rate = sample_rate if sample_rate is not None else \
+            float(os.getenv("QNA_CAPTURE_SAMPLE_RATE", "0.1"))
+        self.flush_every = int(os.getenv("QNA_CAPTURE_FLUSH_EVERY", "100"))
+        self._lock = threading.Lock()
+        self._file = None
+        self._pid = None
+        self._pending = 0
+        if self.enabled:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            logger.info(f"트래픽 캡처 활성화: {self.path} (sample_rate={self.sample_rate})")
+            atexit.register(self.close)
+
+    def _write(self, record: Dict) -> None:
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            # uvicorn 워커 프로세스마다 별도 파일에 하나의 gzip 스트림을 열어둠
+            # (레코드마다 다시 열면 gzip 멤버가 쪼개져 압축률이 크게 떨어짐)
+            if self._pid != os.getpid():
+                self._file = _open(_per_process_path(self.path, os.getpid()), "a")
+                self._pid = os.getpid()
+                self._pending = 0
+            self._file.write(line + "\n")
+            self._pending += 1
+            if self._pending >= self.flush_every:
+                self._file.flush()
+                self._pending = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None and self._pid == os.getpid():
+                self._file.close()
+            self._file = None
+            self._pid = None
+
+    @contextmanager
+    def capture(self, question: str):
+        """
+        요청 하나를 캡처하는 컨텍스트. 샘플링되면 dict를 넘겨주고,
+        호출 측은 여기에 "response"를 채운다. 샘플링되지 않으면 None.
+        """
+        if not self.enabled or random.random() >= self.sample_rate:
+            yield None
+            return
+
+        record: Dict[str, Any] = {"ts": time.time(), "question": question, "stages": {}}
+        token = _stages.set(record["stages"])
+        start = time.perf_counter()
+        try:
+            yield record
+            record["status"] = "ok"
+        except Exception as e:
+            record["status"] = "error"
+            record["error"] = str(e)
+            raise
+        finally:
+            _stages.reset(token)
+            record["latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            try:
+                self._write(record)
+            except Exception as e:
+                logger.warning(f"트래픽 캡처 기록 실패: {e}")
+
+
+def is_replayable(rec: Dict) -> bool:
+    """업스트림 재생으로 재현 가능한 레코드 (정상 종료 + 단계 응답 보유)"""
+    return rec.get("status") == "ok" and bool(rec.get("stages"))
+
+
+class UpstreamPlayback:
+    """캡처된 업스트림 응답을 (질문, 단계) 기준으로 재생 — 오프라인 결정적 재현용"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._stages: Dict[str, Dict[str, Any]] = {}
+        for rec in iter_records(path):
+            if is_replayable(rec):
+                self._stages[rec["question"]] = rec["stages"]
+        logger.info(f"업스트림 재생 모드: {path} ({len(self._stages)}개 질문)")
+
+    def lookup(self, question: str, stage: str) -> Any:
+        try:
+            return self._stages[question][stage]
+        except KeyError:
+            raise KeyError(f"재생 데이터 없음: stage={stage}, question={question!r}")
+
+    def get(self, question: str, stage: str, default: Any = None) -> Any:
+        """기록되지 않았을 수 있는 단계용 (없으면 default)"""
+        return self._stages.get(question, {}).get(stage, default)
+
+
+def load_playback() -> Optional[UpstreamPlayback]:
+    """QNA_PLAYBACK_PATH가 설정돼 있으면 재생 데이터를 로드"""
+    path = os.getenv("QNA_PLAYBACK_PATH")
+    return UpstreamPlayback(path) if path else None
+
+
+@lru_cache(maxsize=1)
+def get_recorder() -> TrafficRecorder:
+    return TrafficRecorder()